@@ -1,14 +1,44 @@
 """Pre-commit tool implementation for MCP server."""
 
 import asyncio
+import contextlib
 import os
 import re
 import time
-from pathlib import Path
+from collections import Counter
 from typing import Any
 
 # Constants
 TIMEOUT_SECONDS = 60
+PATH_CACHE_TTL_SECONDS = 2.0
+MAX_OUTPUT_BYTES = 1 << 20
+_DRAIN_CHUNK_BYTES = 1 << 16
+
+# (cwd, name) -> (exists, checked_at) for the .git / config existence checks
+_PATH_CACHE_MAX_ENTRIES = 32
+_path_cache: dict[tuple[str, str], tuple[bool, float]] = {}
+
+# Compiled once at import; used for every stdout/stderr we parse
+_ANSI_RE = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
+
+# File paths (.py, .yaml, .yml, .toml, .json) and error codes/descriptions in hook output
+_FILE_EXT_RE = re.compile(r"\.(?:py|ya?ml|toml|json)")
+_ERR_CODE_RE = re.compile(r"error|warning|\b[ef][0-9]", re.I)
+
+# One alternation over the lines pre-commit itself prints for each hook: the status
+# line ("ruff.......Failed", "check-yaml.....(no files to check)Skipped") and the
+# "- hook id:" / "- exit code:" markers listed under a failed hook. A hook name
+# must end in a non-dot and the dot run is possessive, so a line of dots that
+# never reaches a status word fails in linear time instead of backtracking
+_HOOK_OUTPUT_RE = re.compile(
+    r"^(?:(?P<hook>[^\n]*?[^.\n])\.{3,}+(?:\([^)\n]{0,80}\))?(?P<status>Passed|Failed|Skipped)"
+    r"|- hook id:[ \t]*(?P<hook_id>\S+)"
+    r"|- exit code:[ \t]*(?P<exit_code>-?\d+))[ \t\r]*$",
+    re.M,
+)
+
+# "[WARNING] ..." / "[INFO] ..." lines printed by pre-commit itself
+_WARN_INFO_RE = re.compile(r"(?m)^[ \t]*(\[(?:WARNING|INFO)\][^\n]*)")
 
 
 async def pre_commit_run() -> dict[str, Any]:
@@ -18,83 +48,130 @@ async def pre_commit_run() -> dict[str, Any]:
     Returns:
         Structured output with status, summary, and details
     """
-    start_time = time.time()
+    start_time = time.monotonic()
+    result: dict[str, Any]
 
     try:
         # Check for git repository
         if not _is_git_repository():
-            return {
+            result = {
                 "status": "system_error",
                 "error": "Git repository not initialized. Please run 'git init' to initialize a repository.",
-                "execution_time": time.time() - start_time,
             }
 
         # Check for pre-commit config
-        if not _has_precommit_config():
-            return {
-                "status": "system_error",
-                "error": "No .pre-commit-config.yaml found in current directory.",
-                "execution_time": time.time() - start_time,
-            }
-
-        # Run pre-commit
-        result = await _run_precommit_command()
-        execution_time = time.time() - start_time
-
-        if result["timed_out"]:
-            return {
-                "status": "timeout",
-                "error": f"Pre-commit execution exceeded {TIMEOUT_SECONDS} seconds",
-                "execution_time": execution_time,
-                "partial_output": result["stdout"][:1000] if result["stdout"] else None,
-            }
-
-        # Parse and structure the output
-        return await _parse_precommit_output(result["returncode"], result["stdout"], result["stderr"], execution_time)
+        elif not _has_precommit_config():
+            result = {"status": "system_error", "error": "No .pre-commit-config.yaml found in current directory."}
+
+        else:
+            # Run pre-commit
+            command_result = await _run_precommit_command()
+
+            if command_result["timed_out"]:
+                result = {
+                    "status": "timeout",
+                    "error": f"Pre-commit execution exceeded {TIMEOUT_SECONDS} seconds",
+                    "partial_output": command_result["stdout"][:1000] if command_result["stdout"] else None,
+                }
+            else:
+                # Parse and structure the output
+                result = await _parse_precommit_output(
+                    command_result["returncode"], command_result["stdout"], command_result["stderr"]
+                )
+
+                # Summary and failures only cover the output that was kept
+                if command_result["output_truncated"]:
+                    result["output_truncated"] = True
 
     except Exception as e:
-        return {"status": "system_error", "error": f"Unexpected error: {str(e)}", "execution_time": time.time() - start_time}
+        result = {"status": "system_error", "error": f"Unexpected error: {str(e)}"}
+
+    # Stamped once here so every outcome reports the same total wall time
+    result["execution_time"] = time.monotonic() - start_time
+    return result
 
 
 def _is_git_repository() -> bool:
     """Check if current directory is a git repository."""
-    return Path(".git").exists()
+    return _cached_exists(".git")
 
 
 def _has_precommit_config() -> bool:
     """Check if .pre-commit-config.yaml exists."""
-    return Path(".pre-commit-config.yaml").exists()
+    return _cached_exists(".pre-commit-config.yaml")
+
+
+def _cached_exists(name: str) -> bool:
+    """Check if name exists in the current directory, reusing recent results."""
+    key = (os.getcwd(), name)
+    now = time.monotonic()
+    cached = _path_cache.get(key)
+    if cached is not None and now - cached[1] <= PATH_CACHE_TTL_SECONDS:
+        return cached[0]
+
+    if len(_path_cache) >= _PATH_CACHE_MAX_ENTRIES:
+        _path_cache.clear()
+    exists = os.path.exists(name)
+    _path_cache[key] = (exists, now)
+    return exists
+
+
+def _clear_path_cache() -> None:
+    """Forget all cached existence checks."""
+    _path_cache.clear()
 
 
 async def _run_precommit_command() -> dict[str, Any]:
     """Run the pre-commit command with timeout."""
-    cmd = ["pre-commit", "run"]
+    # Color is off when stdout is a pipe, but PRE_COMMIT_COLOR=always in the
+    # environment would force it; --color wins over the env var
+    cmd = ["pre-commit", "run", "--color=never"]
 
     try:
         process = await asyncio.create_subprocess_exec(
             *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, cwd=os.getcwd()
         )
 
-        # Wait for completion with timeout
+        # Wait for completion with timeout, keeping at most MAX_OUTPUT_BYTES of each stream
+        assert process.stdout is not None and process.stderr is not None
         try:
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=TIMEOUT_SECONDS)
+            async with asyncio.timeout(TIMEOUT_SECONDS):
+                readers = (
+                    asyncio.create_task(_read_capped(process.stdout)),
+                    asyncio.create_task(_read_capped(process.stderr)),
+                )
+                try:
+                    (stdout, stdout_truncated), (stderr, stderr_truncated) = await asyncio.gather(*readers)
+                except BaseException:
+                    # gather() leaves the other reader running when one fails
+                    for reader in readers:
+                        reader.cancel()
+                    raise
+                await process.wait()
 
             return {
                 "returncode": process.returncode,
                 "stdout": stdout.decode("utf-8", errors="replace"),
                 "stderr": stderr.decode("utf-8", errors="replace"),
                 "timed_out": False,
+                "output_truncated": stdout_truncated or stderr_truncated,
             }
 
-        except TimeoutError:
-            # Kill the process on timeout
-            try:
-                process.kill()
-                await process.wait()
-            except Exception:
-                pass
+        except TimeoutError:  # asyncio.TimeoutError is an alias since 3.11
+            await _kill_and_reap(process)
+            return {
+                "returncode": -1,
+                "stdout": "",
+                "stderr": "Process timed out",
+                "timed_out": True,
+                "output_truncated": False,
+            }
 
-            return {"returncode": -1, "stdout": "", "stderr": "Process timed out", "timed_out": True}
+        except BaseException:
+            # A failed read or a cancelled caller must not leave pre-commit
+            # running with nobody reading its pipes
+            await _kill_and_reap(process)
+            raise
 
     except FileNotFoundError:
         return {
@@ -102,181 +179,208 @@ async def _run_precommit_command() -> dict[str, Any]:
             "stdout": "",
             "stderr": "pre-commit command not found. Is pre-commit installed?",
             "timed_out": False,
+            "output_truncated": False,
         }
 
 
-async def _parse_precommit_output(returncode: int, stdout: str, stderr: str, execution_time: float) -> dict[str, Any]:
-    """Parse pre-commit output into structured format."""
+async def _kill_and_reap(process: asyncio.subprocess.Process) -> None:
+    """Kill process, then always reap it so long-running servers don't collect zombies."""
+    # It may already have exited
+    with contextlib.suppress(ProcessLookupError):
+        process.kill()
+    with contextlib.suppress(Exception):
+        await process.wait()
+
+
+async def _read_capped(stream: asyncio.StreamReader, limit: int = MAX_OUTPUT_BYTES) -> tuple[bytes, bool]:
+    """
+    Read up to limit bytes from stream, then drain and discard the rest until EOF.
+
+    Returns:
+        The bytes kept and whether anything past limit was discarded
+    """
+    try:
+        data = await stream.readexactly(limit)
+    except asyncio.IncompleteReadError as e:
+        return e.partial, False
+
+    # Keep reading so the process never blocks on a full pipe
+    truncated = False
+    while await stream.read(_DRAIN_CHUNK_BYTES):
+        truncated = True
+    return data, truncated
+
+
+async def _parse_precommit_output(returncode: int, stdout: str, stderr: str) -> dict[str, Any]:
+    """Parse pre-commit output into structured format; the caller adds execution_time."""
+
+    if returncode not in (0, 1):
+        # System error
+        return {
+            "status": "system_error",
+            "error": "Pre-commit execution failed",
+            "raw_output": _strip_ansi_codes(stdout),
+            "stderr": _strip_ansi_codes(stderr),
+        }
 
     # Clean output (remove ANSI color codes)
     clean_stdout = _strip_ansi_codes(stdout)
-    clean_stderr = _strip_ansi_codes(stderr)
-    
-    # Extract warnings and info messages
-    warnings = _extract_warnings_and_info(clean_stdout)
+
+    # Extract summary, warnings/info messages and failures
+    summary, warnings, failures = _scan_output(clean_stdout)
+    result: dict[str, Any]
 
     if returncode == 0:
         # Success case
         result = {
             "status": "success",
-            "summary": _extract_summary(clean_stdout),
-            "execution_time": execution_time,
-            "modified_files": await _get_modified_files(),
+            "summary": summary,
+            "modified_files": await _get_modified_files(assume_git=True),
         }
-        if warnings:
-            result["warnings"] = warnings
-        return result
-
-    elif returncode == 1:
+    else:
         # Hooks failed
-        failures = _extract_failures(clean_stdout)
         result = {
             "status": "hooks_failed",
-            "summary": _extract_summary(clean_stdout),
+            "summary": summary,
             "failures": failures,
-            "execution_time": execution_time,
-            "modified_files": await _get_modified_files(),
+            "modified_files": await _get_modified_files(assume_git=True),
             "context_output": clean_stdout[:2000],  # First 2000 chars for context
         }
-        if warnings:
-            result["warnings"] = warnings
-        return result
 
-    else:
-        # System error
-        return {
-            "status": "system_error",
-            "error": "Pre-commit execution failed",
-            "execution_time": execution_time,
-            "raw_output": clean_stdout,
-            "stderr": clean_stderr,
-        }
+    if warnings:
+        result["warnings"] = warnings
+    return result
 
 
 def _strip_ansi_codes(text: str) -> str:
     """Remove ANSI color codes from text."""
-    ansi_escape = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
-    return ansi_escape.sub("", text)
+    # Output captured without a TTY usually has no escapes at all
+    if "\x1b" not in text:
+        return text
+    return _ANSI_RE.sub("", text)
 
 
 def _extract_warnings_and_info(output: str) -> list[str]:
     """Extract warning and info messages from pre-commit output."""
-    messages = []
-    lines = output.split("\n")
-    
-    for line in lines:
-        stripped = line.strip()
-        if stripped.startswith("[WARNING]") or stripped.startswith("[INFO]"):
-            messages.append(stripped)
-    
-    return messages
+    return [m.group(1).strip() for m in _WARN_INFO_RE.finditer(output)]
 
 
-def _extract_summary(output: str) -> dict[str, int]:
+def _extract_summary(output: str, hook_matches: list[re.Match[str]] | None = None) -> dict[str, int]:
     """Extract summary statistics from pre-commit output."""
-    lines = output.split("\n")
-    hooks_passed = 0
-    hooks_failed = 0
-    hooks_skipped = 0
+    if hook_matches is None:
+        hook_matches = list(_HOOK_OUTPUT_RE.finditer(output))
 
-    for line in lines:
-        if "Passed" in line or "✓" in line or "PASSED" in line:
-            hooks_passed += 1
-        elif "Failed" in line or "✗" in line or "FAILED" in line:
-            hooks_failed += 1
-        elif "Skipped" in line or "SKIPPED" in line or "(no files to check)" in line:
-            hooks_skipped += 1
+    counts = Counter(m["status"] for m in hook_matches)
+    return {"hooks_passed": counts["Passed"], "hooks_failed": counts["Failed"], "hooks_skipped": counts["Skipped"]}
 
-    return {"hooks_passed": hooks_passed, "hooks_failed": hooks_failed, "hooks_skipped": hooks_skipped}
 
-
-def _extract_failures(output: str) -> list[dict[str, Any]]:
+def _extract_failures(output: str, hook_matches: list[re.Match[str]] | None = None) -> list[dict[str, Any]]:
     """Extract failure details grouped by hook type."""
-    failures = []
-    lines = output.split("\n")
-    current_hook = None
-    current_files = []
-    current_errors = []
-
-    for line in lines:
-        # Detect hook names (lines that end with "FAILED" or "Failed")
-        if line.strip().endswith(("FAILED", "Failed")):
-            # Save previous hook if exists
-            if current_hook:
-                failures.append({"hook": current_hook, "files": current_files.copy(), "errors": current_errors.copy()})
-
-            # Start new hook
-            current_hook = line.split(".")[0].strip() if "." in line else line.strip()
-            current_files = []
-            current_errors = []
-
-        # Extract file paths and errors
-        elif current_hook and line.strip():
-            # Look for file paths (contain .py, .yaml, etc.)
-            if any(ext in line for ext in [".py", ".yaml", ".yml", ".toml", ".json"]):
-                # Extract just the filename
-                parts = line.strip().split()
-                for part in parts:
-                    if any(ext in part for ext in [".py", ".yaml", ".yml", ".toml", ".json"]):
-                        if part not in current_files:
-                            current_files.append(part)
-
-            # Capture error messages (lines that contain error codes or descriptions)
-            elif any(
-                indicator in line.lower()
-                for indicator in [
-                    "error",
-                    "warning",
-                    "e0",
-                    "e1",
-                    "e2",
-                    "e3",
-                    "e4",
-                    "e5",
-                    "e6",
-                    "e7",
-                    "e8",
-                    "e9",
-                    "f0",
-                    "f1",
-                    "f2",
-                    "f3",
-                    "f4",
-                    "f5",
-                    "f6",
-                    "f7",
-                    "f8",
-                    "f9",
-                ]
-            ):
-                current_errors.append(line.strip())
-
-    # Don't forget the last hook
-    if current_hook:
-        failures.append({"hook": current_hook, "files": current_files, "errors": current_errors})
+    if hook_matches is None:
+        hook_matches = list(_HOOK_OUTPUT_RE.finditer(output))
+    failures: list[dict[str, Any]] = []
+    body_start = -1  # Where the current failed hook's details begin; -1 outside a failed hook
+
+    for match in hook_matches:
+        status = match["status"]
+        if status is None:
+            # Hook id / exit code markers describe the failed hook above them
+            if body_start >= 0:
+                if match["hook_id"] is not None:
+                    failures[-1]["hook_id"] = match["hook_id"]
+                else:
+                    failures[-1]["exit_code"] = int(match["exit_code"])
+            continue
+
+        # A failed hook's details are everything printed up to the next status line
+        if body_start >= 0:
+            failures[-1]["files"], failures[-1]["errors"] = _extract_failure_details(output[body_start : match.start()])
+            body_start = -1
+
+        if status == "Failed":
+            failures.append({"hook": match["hook"].strip(), "hook_id": None, "exit_code": None, "files": [], "errors": []})
+            body_start = match.end()
+
+    if body_start >= 0:
+        failures[-1]["files"], failures[-1]["errors"] = _extract_failure_details(output[body_start:])
 
     return failures
 
 
-async def _get_modified_files() -> list[str]:
-    """Get list of modified files using git status."""
-    if not _is_git_repository():
+def _extract_failure_details(body: str) -> tuple[list[str], list[str]]:
+    """Extract file paths and error messages from the output of one failed hook."""
+    files: list[str] = []
+    files_seen: set[str] = set()
+    errors: list[str] = []
+
+    # Bound once so the per-line loop below does no global/attribute lookups
+    has_file_ext = _FILE_EXT_RE.search
+    has_err_code = _ERR_CODE_RE.search
+    add_file = files.append
+    add_seen = files_seen.add
+    add_error = errors.append
+
+    for line in body.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            continue
+
+        # Look for file paths (contain .py, .yaml, etc.)
+        if has_file_ext(line):
+            # Extract just the filename
+            for part in stripped.split():
+                if part not in files_seen and has_file_ext(part):
+                    add_seen(part)
+                    add_file(part)
+
+        # Capture error messages (lines that contain error codes or descriptions)
+        elif has_err_code(line):
+            add_error(stripped)
+
+    return files, errors
+
+
+def _scan_output(output: str) -> tuple[dict[str, int], list[str], list[dict[str, Any]]]:
+    """Extract summary, warnings and failures from pre-commit output."""
+    # Find hook status lines and markers once and share them between summary and failures
+    hook_matches = list(_HOOK_OUTPUT_RE.finditer(output))
+    summary = _extract_summary(output, hook_matches)
+
+    # Nothing to extract on the common all-passed path
+    failures = _extract_failures(output, hook_matches) if summary["hooks_failed"] else []
+
+    return summary, _extract_warnings_and_info(output), failures
+
+
+async def _get_modified_files(*, assume_git: bool = False) -> list[str]:
+    """
+    Get list of modified files using git status.
+
+    Args:
+        assume_git: Skip the repository check when the caller already verified it
+    """
+    if not assume_git and not _is_git_repository():
         return []
 
     try:
         result = await asyncio.create_subprocess_exec(
-            "git", "status", "--porcelain", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            "git", "status", "--porcelain", "-z", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
         )
 
         stdout, _ = await result.communicate()
 
-        modified_files = []
-        for line in stdout.decode("utf-8").split("\n"):
-            if line.strip() and not line.startswith("??"):
-                # Extract filename (after status indicators)
-                filename = line[3:].strip()
-                if filename:
-                    modified_files.append(filename)
+        # -z gives NUL-separated "XY path" entries with paths left unquoted, so
+        # names containing spaces or newlines survive; renames and copies are
+        # followed by one more entry holding the original path
+        modified_files: list[str] = []
+        add_file = modified_files.append
+        entries = iter(stdout.split(b"\0"))
+        for entry in entries:
+            if len(entry) > 3 and not entry.startswith(b"??"):
+                # Extract filename (after status indicators); only decode the ones we keep
+                add_file(entry[3:].decode("utf-8", errors="replace"))
+            if entry[:1] in (b"R", b"C") or entry[1:2] in (b"R", b"C"):
+                next(entries, None)
 
         return modified_files
 
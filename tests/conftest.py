@@ -1,17 +1,114 @@
 """Test configuration and shared fixtures."""
 
+import asyncio
 import os
 import tempfile
 from collections.abc import Generator
 from pathlib import Path
+from typing import Any
 
 import pytest
 
+from pre_commit_mcp.tools import _clear_path_cache
+
+# Keep throwaway repositories in RAM where Linux provides a tmpfs; None falls back to the default temp dir
+TEMP_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+def make_stream_reader(data: bytes) -> asyncio.StreamReader:
+    """Create a stream reader that yields data and then EOF."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+class FailingStreamReader:
+    """Stream stand-in whose reads raise the given exception."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+    async def readexactly(self, n: int) -> bytes:
+        raise self.error
+
+    async def read(self, n: int = -1) -> bytes:
+        raise self.error
+
+
+class FakeProcess:
+    """
+    Lightweight stand-in for asyncio.subprocess.Process.
+
+    Output is served both through communicate() and through the stdout/stderr
+    stream readers; raises makes both communicate() and stdout reading fail,
+    kill_raises makes kill() fail. kill() and wait() calls are counted.
+    """
+
+    def __init__(
+        self,
+        returncode: int = 0,
+        stdout: bytes = b"",
+        stderr: bytes = b"",
+        raises: BaseException | None = None,
+        kill_raises: BaseException | None = None,
+    ) -> None:
+        self.returncode = returncode
+        self.stdout = make_stream_reader(stdout) if raises is None else FailingStreamReader(raises)
+        self.stderr = make_stream_reader(stderr)
+        self.kill_calls = 0
+        self.wait_calls = 0
+        self._output = (stdout, stderr)
+        self._raises = raises
+        self._kill_raises = kill_raises
+
+    async def communicate(self) -> tuple[bytes, bytes]:
+        if self._raises is not None:
+            raise self._raises
+        return self._output
+
+    async def wait(self) -> int:
+        self.wait_calls += 1
+        return self.returncode
+
+    def kill(self) -> None:
+        self.kill_calls += 1
+        if self._kill_raises is not None:
+            raise self._kill_raises
+
+
+@pytest.fixture(autouse=True)
+def clear_path_cache() -> Generator[None, None, None]:
+    """Start every test without cached .git / config existence checks."""
+    _clear_path_cache()
+    yield
+    _clear_path_cache()
+
+
+@pytest.fixture
+def subprocess_mock(monkeypatch: pytest.MonkeyPatch) -> dict[str, Any]:
+    """
+    Replace asyncio.create_subprocess_exec for the duration of a test.
+
+    Set "proc" to the process to hand back or "raises" to an exception to raise;
+    the positional arguments of every call are collected in "calls".
+    """
+    holder: dict[str, Any] = {"proc": None, "raises": None, "calls": []}
+
+    async def fake_create_subprocess_exec(*args: Any, **kwargs: Any) -> Any:
+        holder["calls"].append(args)
+        if holder["raises"] is not None:
+            raise holder["raises"]
+        return holder["proc"]
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", fake_create_subprocess_exec)
+    return holder
+
 
 @pytest.fixture
 def temp_git_repo() -> Generator[Path, None, None]:
     """Create a temporary directory with git repository."""
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with tempfile.TemporaryDirectory(dir=TEMP_ROOT) as temp_dir:
         repo_path = Path(temp_dir)
         git_dir = repo_path / ".git"
         git_dir.mkdir()
@@ -29,7 +126,7 @@ def temp_git_repo() -> Generator[Path, None, None]:
 @pytest.fixture
 def temp_non_git_repo() -> Generator[Path, None, None]:
     """Create a temporary directory without git repository."""
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with tempfile.TemporaryDirectory(dir=TEMP_ROOT) as temp_dir:
         repo_path = Path(temp_dir)
 
         # Change to the temp directory for the test
@@ -1,11 +1,15 @@
 """Tests for tools.py module."""
 
+import asyncio
+import time
 from pathlib import Path
-from unittest.mock import AsyncMock, Mock, patch
+from typing import Any
+from unittest.mock import patch
 
 import pytest
 
 from pre_commit_mcp.tools import (
+    _clear_path_cache,
     _extract_failures,
     _extract_summary,
     _extract_warnings_and_info,
@@ -13,10 +17,13 @@ from pre_commit_mcp.tools import (
     _has_precommit_config,
     _is_git_repository,
     _parse_precommit_output,
+    _read_capped,
     _run_precommit_command,
+    _scan_output,
     _strip_ansi_codes,
     pre_commit_run,
 )
+from tests.conftest import FakeProcess, make_stream_reader
 
 
 class TestUtilityFunctions:
@@ -30,6 +37,13 @@ class TestUtilityFunctions:
         """Test git repository detection when .git does not exist."""
         assert _is_git_repository() is False
 
+    def test_is_git_repository_worktree(self, temp_non_git_repo: Path, subprocess_mock: dict[str, Any]) -> None:
+        """Test git repository detection when .git is a worktree/submodule pointer file."""
+        (temp_non_git_repo / ".git").write_text("gitdir: /elsewhere/.git/worktrees/feature\n")
+
+        assert _is_git_repository() is True
+        assert subprocess_mock["calls"] == []
+
     def test_has_precommit_config_true(self, temp_git_repo: Path, precommit_config: str) -> None:
         """Test pre-commit config detection when file exists."""
         config_file = temp_git_repo / ".pre-commit-config.yaml"
@@ -41,6 +55,17 @@ class TestUtilityFunctions:
         """Test pre-commit config detection when file does not exist."""
         assert _has_precommit_config() is False
 
+    def test_has_precommit_config_cached(self, temp_git_repo: Path, precommit_config: str) -> None:
+        """Test that config detection is cached per directory until cleared."""
+        assert _has_precommit_config() is False
+
+        config_file = temp_git_repo / ".pre-commit-config.yaml"
+        config_file.write_text(precommit_config)
+        assert _has_precommit_config() is False
+
+        _clear_path_cache()
+        assert _has_precommit_config() is True
+
     def test_strip_ansi_codes(self) -> None:
         """Test ANSI code stripping functionality."""
         # Test with ANSI color codes
@@ -52,6 +77,9 @@ class TestUtilityFunctions:
         normal_text = "No colors here"
         assert _strip_ansi_codes(normal_text) == normal_text
 
+        # Clean text is returned as-is without going through the regex
+        assert _strip_ansi_codes(normal_text) is normal_text
+
     def test_extract_summary_success(self) -> None:
         """Test summary extraction from successful output."""
         output = """trailing-whitespace.................................................Passed
@@ -130,9 +158,97 @@ src/utils.py:5:1: F401 'os' imported but unused
 
         # Check first failure
         assert failures[0]["hook"] == "ruff"
+        assert failures[0]["hook_id"] == "ruff"
+        assert failures[0]["exit_code"] is None
 
         # Check second failure
         assert failures[1]["hook"] == "hookid-format"
+        assert failures[1]["hook_id"] == "hookid-format"
+        assert failures[1]["exit_code"] == 1
+
+    def test_extract_failures_errors(self) -> None:
+        """Test error message capture for failing hooks."""
+        output = """mypy.....................................................................Failed
+- hook id: mypy
+- exit code: 1
+
+Found 2 errors in 1 file (checked 3 source files)
+E999 SyntaxError: invalid syntax
+profile1 settings unchanged
+"""
+
+        failures = _extract_failures(output)
+        assert len(failures) == 1
+        assert failures[0]["errors"] == [
+            "Found 2 errors in 1 file (checked 3 source files)",
+            "E999 SyntaxError: invalid syntax",
+        ]
+
+    def test_extract_failures_stops_at_next_hook(self) -> None:
+        """Test that output after a later passing or skipped hook is not attributed to a failure."""
+        output = """Trim Trailing Whitespace.................................................Failed
+- hook id: trailing-whitespace
+- exit code: 1
+- files were modified by this hook
+
+Fixing src/app.py
+check yaml...............................................................Passed
+check toml...........................................(no files to check)Skipped
+E123 closing bracket does not match indentation
+"""
+
+        failures = _extract_failures(output)
+        assert failures == [
+            {
+                "hook": "Trim Trailing Whitespace",
+                "hook_id": "trailing-whitespace",
+                "exit_code": 1,
+                "files": ["src/app.py"],
+                "errors": [],
+            }
+        ]
+
+    def test_scan_output_skips_failures_when_all_passed(self) -> None:
+        """Test that failure extraction is skipped when no hook failed."""
+        output = """trailing-whitespace.................................................Passed
+check-yaml...........................................(no files to check)Skipped
+"""
+
+        with patch("pre_commit_mcp.tools._extract_failures") as mock_extract_failures:
+            summary, _, failures = _scan_output(output)
+
+        mock_extract_failures.assert_not_called()
+        assert summary["hooks_failed"] == 0
+        assert failures == []
+
+    def test_scan_output_single_pass(self) -> None:
+        """Test that one scan yields summary, warnings and failures together."""
+        output = """[WARNING] Unstaged files detected.
+trailing-whitespace.................................................Passed
+ruff.....................................................................Failed
+- hook id: ruff
+- exit code: 1
+
+src/main.py:10:1: E501 line too long (90 > 79 characters)
+"""
+
+        summary, warnings, failures = _scan_output(output)
+        assert summary == {"hooks_passed": 1, "hooks_failed": 1, "hooks_skipped": 0}
+        assert warnings == ["[WARNING] Unstaged files detected."]
+        assert len(failures) == 1
+        assert failures[0]["hook"] == "ruff"
+        assert failures[0]["files"] == ["src/main.py:10:1:"]
+
+    @pytest.mark.parametrize("output", ["." * 200_000, "a...(" * 50_000], ids=["dot-run", "open-paren-runs"])
+    def test_scan_output_linear_on_unterminated_dot_runs(self, output: str) -> None:
+        """Test that long dot runs that never reach a status word don't backtrack."""
+        start = time.monotonic()
+        summary, warnings, failures = _scan_output(output)
+
+        assert time.monotonic() - start < 1.0
+        assert summary == {"hooks_passed": 0, "hooks_failed": 0, "hooks_skipped": 0}
+        assert warnings == []
+        assert failures == []
 
 
 class TestAsyncFunctions:
@@ -145,53 +261,119 @@ class TestAsyncFunctions:
         assert modified_files == []
 
     @pytest.mark.asyncio
-    async def test_get_modified_files_with_git(self, temp_git_repo: Path) -> None:
+    async def test_get_modified_files_with_git(self, temp_git_repo: Path, subprocess_mock: dict[str, Any]) -> None:
         """Test modified files detection in git repo."""
         # Mock git status output
-        mock_process = AsyncMock()
-        mock_process.communicate.return_value = (b" M src/main.py\n A src/new.py\n", b"")
+        subprocess_mock["proc"] = FakeProcess(stdout=b" M src/main.py\0A  src/new.py\0")
 
-        with patch("asyncio.create_subprocess_exec", return_value=mock_process):
-            modified_files = await _get_modified_files()
+        modified_files = await _get_modified_files()
 
         assert "src/main.py" in modified_files
         assert "src/new.py" in modified_files
 
     @pytest.mark.asyncio
-    async def test_run_precommit_command_success(self) -> None:
+    async def test_get_modified_files_renames_and_spaces(self, temp_git_repo: Path, subprocess_mock: dict[str, Any]) -> None:
+        """Test that rename and copy sources are skipped and paths are kept verbatim."""
+        subprocess_mock["proc"] = FakeProcess(
+            stdout=b"R  src/new name.py\0src/old name.py\0 C src/copy.py\0src/orig.py\0 M docs/ lead.md\0?? scratch.txt\0"
+        )
+
+        modified_files = await _get_modified_files()
+
+        assert modified_files == ["src/new name.py", "src/copy.py", "docs/ lead.md"]
+
+    @pytest.mark.asyncio
+    async def test_get_modified_files_assume_git(self, temp_non_git_repo: Path, subprocess_mock: dict[str, Any]) -> None:
+        """Test that assume_git skips the repository check."""
+        subprocess_mock["proc"] = FakeProcess(stdout=b" M src/main.py\0")
+
+        with patch("pre_commit_mcp.tools._is_git_repository") as mock_is_git:
+            modified_files = await _get_modified_files(assume_git=True)
+
+        mock_is_git.assert_not_called()
+        assert modified_files == ["src/main.py"]
+
+    @pytest.mark.asyncio
+    async def test_run_precommit_command_success(self, subprocess_mock: dict[str, Any]) -> None:
         """Test successful pre-commit command execution."""
-        mock_process = AsyncMock()
-        mock_process.returncode = 0
-        mock_process.communicate.return_value = (b"All hooks passed", b"")
+        subprocess_mock["proc"] = FakeProcess(stdout=b"All hooks passed")
 
-        with patch("asyncio.create_subprocess_exec", return_value=mock_process):
-            result = await _run_precommit_command()
+        result = await _run_precommit_command()
 
+        assert subprocess_mock["calls"][0][:3] == ("pre-commit", "run", "--color=never")
         assert result["returncode"] == 0
         assert result["stdout"] == "All hooks passed"
         assert result["stderr"] == ""
         assert result["timed_out"] is False
+        assert result["output_truncated"] is False
 
     @pytest.mark.asyncio
-    async def test_run_precommit_command_timeout(self) -> None:
+    async def test_run_precommit_command_timeout(self, subprocess_mock: dict[str, Any]) -> None:
         """Test pre-commit command timeout handling."""
-        mock_process = AsyncMock()
-        mock_process.communicate.side_effect = TimeoutError()
-        # Configure kill and wait to not return coroutines
-        mock_process.kill = Mock(return_value=None)  # Use regular Mock for sync methods
-        mock_process.wait = AsyncMock(return_value=None)
+        process = subprocess_mock["proc"] = FakeProcess(raises=TimeoutError())
 
-        with patch("asyncio.create_subprocess_exec", return_value=mock_process):
-            result = await _run_precommit_command()
+        result = await _run_precommit_command()
 
         assert result["timed_out"] is True
         assert result["returncode"] == -1
+        assert process.kill_calls == 1
+        assert process.wait_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_run_precommit_command_timeout_already_exited(self, subprocess_mock: dict[str, Any]) -> None:
+        """Test that a process which exits before it can be killed is still reaped."""
+        process = subprocess_mock["proc"] = FakeProcess(raises=TimeoutError(), kill_raises=ProcessLookupError())
+
+        result = await _run_precommit_command()
+
+        assert result["timed_out"] is True
+        assert process.wait_calls == 1
 
     @pytest.mark.asyncio
-    async def test_run_precommit_command_not_found(self) -> None:
+    async def test_read_capped_truncates_and_drains(self) -> None:
+        """Test that output beyond the limit is discarded but fully consumed."""
+        reader = make_stream_reader(b"x" * 100)
+
+        data, truncated = await _read_capped(reader, limit=10)
+
+        assert data == b"x" * 10
+        assert truncated is True
+        assert reader.at_eof()
+
+    @pytest.mark.asyncio
+    async def test_read_capped_short_output(self) -> None:
+        """Test that output under the limit is returned whole."""
+        data, truncated = await _read_capped(make_stream_reader(b"All hooks passed"), limit=1024)
+        assert data == b"All hooks passed"
+        assert truncated is False
+
+    @pytest.mark.asyncio
+    async def test_read_capped_exact_limit(self) -> None:
+        """Test that output of exactly the limit is not reported as truncated."""
+        data, truncated = await _read_capped(make_stream_reader(b"x" * 10), limit=10)
+        assert data == b"x" * 10
+        assert truncated is False
+
+    @pytest.mark.asyncio
+    async def test_run_precommit_command_reader_error_cancels_other_reader(self, subprocess_mock: dict[str, Any]) -> None:
+        """Test that a failing stdout read kills pre-commit and doesn't leave the stderr reader running."""
+        process = subprocess_mock["proc"] = FakeProcess(raises=OSError("read failed"))
+        process.stderr = asyncio.StreamReader()  # never reaches EOF
+
+        with pytest.raises(OSError, match="read failed"):
+            await _run_precommit_command()
+
+        await asyncio.sleep(0)
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        assert process.kill_calls == 1
+        assert process.wait_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_run_precommit_command_not_found(self, subprocess_mock: dict[str, Any]) -> None:
         """Test pre-commit command not found error."""
-        with patch("asyncio.create_subprocess_exec", side_effect=FileNotFoundError()):
-            result = await _run_precommit_command()
+        subprocess_mock["raises"] = FileNotFoundError()
+
+        result = await _run_precommit_command()
 
         assert result["returncode"] == -1
         assert "not found" in result["stderr"]
@@ -202,12 +384,11 @@ class TestAsyncFunctions:
         stdout = "trailing-whitespace.................................................Passed\n"
 
         with patch("pre_commit_mcp.tools._get_modified_files", return_value=[]):
-            result = await _parse_precommit_output(0, stdout, "", 1.5)
+            result = await _parse_precommit_output(0, stdout, "")
 
         assert result["status"] == "success"
         assert result["summary"]["hooks_passed"] == 1
         assert result["summary"]["hooks_skipped"] == 0
-        assert result["execution_time"] == 1.5
 
     @pytest.mark.asyncio
     async def test_parse_precommit_output_hooks_failed(self) -> None:
@@ -219,7 +400,7 @@ ruff.....................................................................Failed
 """
 
         with patch("pre_commit_mcp.tools._get_modified_files", return_value=["src/main.py"]):
-            result = await _parse_precommit_output(1, stdout, "", 2.0)
+            result = await _parse_precommit_output(1, stdout, "")
 
         assert result["status"] == "hooks_failed"
         assert result["summary"]["hooks_passed"] == 1
@@ -228,13 +409,16 @@ ruff.....................................................................Failed
         assert len(result["failures"]) > 0
         assert result["modified_files"] == ["src/main.py"]
 
+        # Short, color-free output is passed through as context without being copied
+        assert result["context_output"] is stdout
+
     @pytest.mark.asyncio
     async def test_parse_precommit_output_system_error(self) -> None:
         """Test parsing pre-commit output with system error."""
-        result = await _parse_precommit_output(2, "", "Some system error", 0.5)
+        result = await _parse_precommit_output(2, "", "Some system error")
 
         assert result["status"] == "system_error"
-        assert result["execution_time"] == 0.5
+        assert result["stderr"] == "Some system error"
 
 
 class TestMainFunction:
@@ -272,6 +456,28 @@ class TestMainFunction:
 
         assert result["status"] == "timeout"
         assert "exceeded" in result["error"]
+        assert result["execution_time"] >= 0
+
+    @pytest.mark.asyncio
+    async def test_pre_commit_run_output_truncated(self, temp_git_repo: Path, precommit_config: str) -> None:
+        """Test that pre_commit_run flags results parsed from capped output."""
+        (temp_git_repo / ".pre-commit-config.yaml").write_text(precommit_config)
+        command_result = {
+            "returncode": 1,
+            "stdout": "ruff.....Failed\n",
+            "stderr": "",
+            "timed_out": False,
+            "output_truncated": True,
+        }
+
+        with (
+            patch("pre_commit_mcp.tools._run_precommit_command", return_value=command_result),
+            patch("pre_commit_mcp.tools._get_modified_files", return_value=[]),
+        ):
+            result = await pre_commit_run()
+
+        assert result["status"] == "hooks_failed"
+        assert result["output_truncated"] is True
 
     @pytest.mark.asyncio
     async def test_pre_commit_run_exception_handling(self, temp_git_repo: Path) -> None:
@@ -281,3 +487,4 @@ class TestMainFunction:
 
         assert result["status"] == "system_error"
         assert "Unexpected error" in result["error"]
+        assert result["execution_time"] >= 0